@@ -8,6 +8,7 @@ DEFAULT_OUTPUT="./data"
 DEFAULT_LIMIT=""
 DEFAULT_TIMEOUT="0.5"
 DEFAULT_RETRIES="5"
+DEFAULT_CONCURRENCY="4"
 
 # Функция показа помощи
 show_help() {
@@ -22,6 +23,7 @@ show_help() {
     echo "  -l, --limit N        Ограничение количества страниц"
     echo "  -t, --timeout SEC    Таймаут между скачиваниями в секундах (по умолчанию: $DEFAULT_TIMEOUT)"
     echo "  -r, --retries N      Количество попыток скачивания при ошибке (по умолчанию: $DEFAULT_RETRIES)"
+    echo "  -c, --concurrency N  Количество одновременных загрузок (по умолчанию: $DEFAULT_CONCURRENCY)"
     echo "  -h, --help           Показать эту справку"
     echo ""
     echo "Примеры:"
@@ -33,6 +35,7 @@ show_help() {
     echo "  $0 -r 3                              # Максимум 3 попытки при ошибке скачивания"
     echo "  $0 -l 10 -t 1.5                      # Лимит 10 страниц с таймаутом 1.5 сек"
     echo "  $0 -l 10 -t 1.5 -r 3                 # Лимит 10 страниц, таймаут 1.5 сек, 3 попытки"
+    echo "  $0 -c 1                              # Загружать уроки последовательно"
     echo "  $0 -u \"https://example.com\" -l 20     # Другой URL и лимит 20 страниц"
 }
 
@@ -42,6 +45,7 @@ OUTPUT="$DEFAULT_OUTPUT"
 LIMIT="$DEFAULT_LIMIT"
 TIMEOUT="$DEFAULT_TIMEOUT"
 RETRIES="$DEFAULT_RETRIES"
+CONCURRENCY="$DEFAULT_CONCURRENCY"
 
 # Проверяем на позиционный аргумент (число)
 if [[ $# -eq 1 && $1 =~ ^[0-9]+$ ]]; then
@@ -72,6 +76,10 @@ while [[ $# -gt 0 ]]; do
             RETRIES="$2"
             shift 2
             ;;
+        -c|--concurrency)
+            CONCURRENCY="$2"
+            shift 2
+            ;;
         -h|--help)
             show_help
             exit 0
@@ -123,15 +131,16 @@ else
 fi
 echo "Таймаут между скачиваниями: $TIMEOUT сек"
 echo "Количество попыток при ошибке: $RETRIES"
+echo "Одновременных загрузок: $CONCURRENCY"
 echo "Дата запуска: $(date '+%Y-%m-%d %H:%M:%S')"
 echo "================================================="
 echo ""
 
 # Запускаем парсер
 if [ -z "$LIMIT" ]; then
-    python3 "$PARSER_SCRIPT" --url "$URL" --output "$OUTPUT" --timeout "$TIMEOUT" --retries "$RETRIES"
+    python3 "$PARSER_SCRIPT" --url "$URL" --output "$OUTPUT" --timeout "$TIMEOUT" --retries "$RETRIES" --concurrency "$CONCURRENCY"
 else
-    python3 "$PARSER_SCRIPT" --url "$URL" --output "$OUTPUT" --limit "$LIMIT" --timeout "$TIMEOUT" --retries "$RETRIES"
+    python3 "$PARSER_SCRIPT" --url "$URL" --output "$OUTPUT" --limit "$LIMIT" --timeout "$TIMEOUT" --retries "$RETRIES" --concurrency "$CONCURRENCY"
 fi
 
 # Проверяем результат выполнения
@@ -5,23 +5,30 @@
 Версия без внешних зависимостей - использует только стандартные библиотеки Python
 
 Использование:
-    python bitrix_course_parser_standalone.py [--limit N] [--output DIR]
+    python bitrix_course_parser_standalone.py [--limit N] [--output DIR] [--concurrency N]
     
 Аргументы:
-    --limit N    : Ограничить количество скачиваемых страниц (по умолчанию: без ограничений)
-    --output DIR : Директория для сохранения файлов (по умолчанию: ./course_data)
+    --limit N       : Ограничить количество скачиваемых страниц (по умолчанию: без ограничений)
+    --output DIR    : Директория для сохранения файлов (по умолчанию: ./course_data)
+    --concurrency N : Количество одновременных загрузок (по умолчанию: 4)
 """
 
 import urllib.request
 import urllib.parse
+import urllib.error
+import http.client
 import html.parser
 import os
 import argparse
 import time
+import threading
 import re
 import json
-import gzip
-import html
+import zlib
+import codecs
+import hashlib
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime
 
 # Импорт функций генерации карты курсов
@@ -34,194 +41,491 @@ except ImportError:
     def generate_course_map(courses, output_file):
         pass
 
+# Необязательные декодеры сжатия: br и zstd запрашиваем у сервера,
+# только если их можно распаковать
+try:
+    import brotli
+except ImportError:
+    brotli = None
 
-class SimpleHTMLParser(html.parser.HTMLParser):
-    def __init__(self):
-        super().__init__()
-        self.links = []
-        self.title = ""
-        self.in_title = False
-        
-    def handle_starttag(self, tag, attrs):
-        if tag == 'title':
-            self.in_title = True
-        elif tag == 'a':
-            href = None
-            for attr_name, attr_value in attrs:
-                if attr_name == 'href':
-                    href = attr_value
-            # Улучшенное определение ссылок на уроки
-            if href:
-                # Проверяем ссылки связанные с уроками
-                if ('lesson' in href.lower() or 
-                    'LESSON_ID' in href or 
-                    'CHAPTER_ID' in href or
-                    ('/learning/course/' in href and ('LESSON_ID=' in href or 'CHAPTER_ID=' in href))):
-                    # Пропускаем CSS и другие не относящиеся к контенту ссылки
-                    if not href.endswith('.css') and not href.endswith('.js'):
-                        self.links.append(href)
+try:
+    from compression import zstd  # Python 3.14+
+except ImportError:
+    zstd = None
+
+# Необязательный быстрый сериализатор JSON, без него используется стандартный json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# Таблица замены символов, недопустимых в именах файлов (строится один раз при загрузке модуля)
+_INVALID_FILENAME_CHARS_TABLE = str.maketrans(dict.fromkeys('<>:"/\\|?*', '_'))
+# Признаки ссылки на урок или главу: "lesson" в любом регистре (включая LESSON_ID) или CHAPTER_ID
+_LESSON_HREF_RE = re.compile(r'(?i:lesson)|CHAPTER_ID')
+# Ссылки на ресурсы, которые не являются страницами курса (.css/.js в любом регистре)
+_SKIPPED_HREF_RE = re.compile(r'\.(?:css|js)$', re.IGNORECASE)
+# Уровень Markdown-заголовка для тегов h1-h6 (смещен на 1: "#" занят заголовком страницы)
+_HEADER_LEVELS = {f'h{n}': n + 1 for n in range(1, 7)}
+# Идентификаторы курса, урока и главы в параметрах запроса URL
+_URL_ID_RE = re.compile(r'[?&](COURSE_ID|LESSON_ID|CHAPTER_ID)=([^&#]+)')
+
+# Заголовки браузера, отправляемые с каждым запросом
+REQUEST_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'ru-RU,ru;q=0.9,en;q=0.8',
+    'Accept-Encoding': ', '.join(
+        ['gzip', 'deflate'] + (['br'] if brotli else []) + (['zstd'] if zstd else [])
+    ),
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1',
+}
+
+# Таймаут сетевых операций одного запроса в секундах
+REQUEST_TIMEOUT = 30
+# Максимальное количество перенаправлений для одного URL
+MAX_REDIRECTS = 5
+# Размер блока при чтении тела ответа
+READ_CHUNK_SIZE = 64 * 1024
+# Максимальный размер распакованного тела ответа (защита от gzip-бомб)
+MAX_RESPONSE_SIZE = 32 * 1024 * 1024
+# Сигнатура gzip и параметр zlib для распаковки gzip-потока
+GZIP_MAGIC = b'\x1f\x8b'
+GZIP_WBITS = 16 + zlib.MAX_WBITS
+
+# HTTP статусы временных ошибок, при которых имеет смысл повторить запрос
+RETRY_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+# Базовая задержка экспоненциального ожидания между попытками: 0.5, 1, 2, 4... сек
+RETRY_BACKOFF_FACTOR = 0.5
+
+# Статусы, которыми сервер просит снизить частоту запросов
+THROTTLE_STATUS_CODES = frozenset({429, 503})
+# Адаптивная пауза между запросами: минимум при замедлении, шаг ускорения и потолок в секундах
+THROTTLE_MIN_INTERVAL = 0.5
+THROTTLE_RECOVERY_STEP = 0.1
+THROTTLE_MAX_INTERVAL = 10.0
+
+# Максимальная длина названия в имени файла в байтах UTF-8: вместе с префиксом
+# course_N_lesson_N_, расширением и суффиксом временного файла имя укладывается
+# в ограничение файловых систем в 255 байт
+MAX_FILENAME_TITLE_BYTES = 160
+
+# Файл в директории вывода со списком сохраненных страниц и их HTTP-валидаторами
+VISITED_CACHE_FILENAME = '.visited.sqlite'
+# Результат get_page_content, когда страница не изменилась с прошлого запуска (304)
+PAGE_NOT_MODIFIED = object()
+
+
+class ResponseTooLargeError(Exception):
+    """Тело ответа превышает MAX_RESPONSE_SIZE"""
+
+
+def check_response_size(size):
+    """Проверка размера тела ответа относительно MAX_RESPONSE_SIZE"""
+    if size > MAX_RESPONSE_SIZE:
+        raise ResponseTooLargeError(
+            f"размер ответа превышает {MAX_RESPONSE_SIZE // (1024 * 1024)} МБ"
+        )
+
+
+def create_deflate_decompressor(first_chunk):
+    """
+    Распаковщик для Content-Encoding: deflate
     
-    def handle_data(self, data):
-        if self.in_title:
-            self.title += data.strip()
+    По стандарту deflate - это поток zlib, но часть серверов отправляет
+    "сырой" deflate без заголовка, поэтому формат определяем по первым байтам.
     
-    def handle_endtag(self, tag):
-        if tag == 'title':
-            self.in_title = False
+    Args:
+        first_chunk: Первый блок тела ответа
+        
+    Returns:
+        Объект zlib.decompressobj
+    """
+    if (len(first_chunk) >= 2 and first_chunk[0] & 0x0f == 8
+            and (first_chunk[0] << 8 | first_chunk[1]) % 31 == 0):
+        return zlib.decompressobj()
+    return zlib.decompressobj(wbits=-zlib.MAX_WBITS)
 
-class TextExtractorParser(html.parser.HTMLParser):
-    def __init__(self):
-        super().__init__()
-        self.text_content = []
-        self.in_script = False
-        self.in_style = False
+
+def iter_response_text(response):
+    """
+    Чтение тела ответа блоками с потоковой распаковкой и декодированием
+    
+    Для ответов gzip, deflate и без сжатия ни сжатые данные, ни распакованные
+    байты, ни текст страницы не хранятся в памяти целиком: каждый блок сразу
+    распаковывается, декодируется и отдается вызывающему коду (например,
+    в HTMLParser.feed). Ответы br и zstd распаковываются целиком.
+    
+    Args:
+        response: Ответ HTTP (http.client.HTTPResponse или ответ urlopen)
+    
+    Yields:
+        str: Очередной фрагмент текста страницы
+    
+    Raises:
+        ResponseTooLargeError: Если тело ответа больше MAX_RESPONSE_SIZE
+        EOFError: Если сжатые данные gzip оборвались до конца потока
+    """
+    # Кодировка из заголовка Content-Type, по умолчанию utf-8
+    charset = response.headers.get_content_charset() or 'utf-8'
+    try:
+        codecs.lookup(charset)
+    except LookupError:
+        charset = 'utf-8'
+    
+    content_length = (response.headers.get('Content-Length') or '').strip()
+    if content_length.isdigit():
+        check_response_size(int(content_length))
+    
+    content_encoding = (response.headers.get('Content-Encoding') or '').strip().lower()
+    # br и zstd распаковываем целиком
+    decompress = None
+    if content_encoding == 'br' and brotli:
+        decompress = brotli.decompress
+    elif content_encoding == 'zstd' and zstd:
+        decompress = zstd.decompress
+    if decompress:
+        raw_content = response.read(MAX_RESPONSE_SIZE + 1)
+        check_response_size(len(raw_content))
+        data = decompress(raw_content)
+        check_response_size(len(data))
+        yield data.decode(charset, errors='ignore')
+        return
+    
+    decoder = codecs.getincrementaldecoder(charset)(errors='ignore')
+    decompressor = None
+    is_gzip = False
+    body_size = 0
+    first_chunk = True
+    while True:
+        chunk = response.read(READ_CHUNK_SIZE)
+        if not chunk:
+            break
+        if first_chunk:
+            first_chunk = False
+            # gzip распаковываем и без заголовка, если данные начинаются с его сигнатуры
+            if content_encoding == 'gzip' or chunk.startswith(GZIP_MAGIC):
+                is_gzip = True
+                decompressor = zlib.decompressobj(wbits=GZIP_WBITS)
+            elif content_encoding == 'deflate':
+                decompressor = create_deflate_decompressor(chunk)
         
-    def handle_starttag(self, tag, attrs):
-        if tag in ['script', 'style']:
-            setattr(self, f'in_{tag}', True)
+        pending = chunk
+        while pending:
+            if decompressor:
+                # Распаковываем порциями, чтобы проверять размер до выделения памяти
+                data = decompressor.decompress(pending, READ_CHUNK_SIZE)
+                if not decompressor.eof:
+                    pending = decompressor.unconsumed_tail
+                elif is_gzip:
+                    # gzip может состоять из нескольких членов подряд (как и в
+                    # gzip.decompress): продолжаем со следующего, пропуская нулевое
+                    # выравнивание после последнего. Данные после конца потока
+                    # находятся в unused_data (unconsumed_tail их дублирует)
+                    pending = decompressor.unused_data.lstrip(b'\0')
+                    if pending:
+                        decompressor = zlib.decompressobj(wbits=GZIP_WBITS)
+                else:
+                    # Данные после конца потока deflate отбрасываем, как zlib.decompress
+                    pending = b''
+            else:
+                data, pending = pending, b''
+            body_size += len(data)
+            check_response_size(body_size)
+            yield decoder.decode(data)
     
-    def handle_data(self, data):
-        if not self.in_script and not self.in_style:
-            text = data.strip()
-            if text:
-                self.text_content.append(text)
+    if decompressor:
+        data = decompressor.flush()
+        check_response_size(body_size + len(data))
+        yield decoder.decode(data)
+        if is_gzip and not decompressor.eof:
+            # Как gzip.decompress: оборванный ответ - ошибка, а не усеченная страница
+            raise EOFError("Сжатые данные gzip оборвались до конца потока")
+    yield decoder.decode(b'', final=True)
+
+
+def iter_tag_aligned_text(chunks):
+    """
+    Перегруппировка фрагментов текста страницы по границам тегов
     
-    def handle_endtag(self, tag):
-        if tag in ['script', 'style']:
-            setattr(self, f'in_{tag}', False)
+    HTMLParser.feed сразу отдает в handle_data текст в конце переданного
+    фрагмента, если после него нет '<', поэтому текстовый узел на границе
+    блоков ответа разбивается на части. Каждый отдаваемый фрагмент
+    заканчивается перед '<' (остаток переносится в следующий), и разбор
+    по частям дает тот же результат, что и разбор страницы целиком.
     
-    def get_text_content(self):
-        cleaned_lines = []
-        for line in self.text_content:
-            line = line.strip()
-            if line and len(line) > 1:
-                cleaned_lines.append(line)
-        return '\n'.join(cleaned_lines)
+    Args:
+        chunks: Итератор фрагментов текста (например, iter_response_text)
+        
+    Yields:
+        str: Фрагмент текста, заканчивающийся перед '<' (последний - концом страницы)
+    """
+    pending = []
+    for text in chunks:
+        split = text.rfind('<')
+        if split < 0:
+            pending.append(text)
+            continue
+        pending.append(text[:split])
+        yield ''.join(pending)
+        pending = [text[split:]]
+    tail = ''.join(pending)
+    if tail:
+        yield tail
+
+
+def dump_json_bytes(data):
+    """
+    Сериализация данных в JSON (UTF-8, отступ 2 пробела)
+    
+    Args:
+        data: Данные для сериализации
+        
+    Returns:
+        bytes: JSON в кодировке UTF-8
+    """
+    if orjson:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2)
+    return json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')
+
+
+def write_file_atomic(path, data):
+    """
+    Атомарная запись файла: данные пишутся одним вызовом во временный файл
+    рядом с целевым, который затем подменяет его через os.replace.
+    Недописанные файлы при прерывании парсинга не появляются
+    
+    Args:
+        path: Путь к файлу
+        data: Содержимое файла (bytes)
+    """
+    # Имя временного файла уникально для потока: параллельные загрузки
+    # одного и того же урока не пишут в общий временный файл
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
 
 
-class MarkdownExtractorParser(html.parser.HTMLParser):
-    def __init__(self):
+class CoursePageParser(html.parser.HTMLParser):
+    """
+    Разбор страницы курса за один проход по HTML: заголовок и описание
+    страницы, ссылки на уроки и содержимое блока courses-right-side
+    для сохранения в Markdown
+    
+    Ссылки на уроки собираются, только если передан page_url: они сразу
+    приводятся к абсолютному виду относительно него и очищаются от повторов.
+    """
+    def __init__(self, page_url=None):
         super().__init__()
-        self.content_parts = []
+        # Заголовок, описание и ссылки на уроки (абсолютные URL без повторов)
+        self.links = []
+        self._page_url = page_url
+        if page_url:
+            parts = urllib.parse.urlsplit(page_url)
+            self._base_url = f"{parts.scheme}://{parts.netloc}"
+        self._seen_links = set()  # Множество для проверки дублей за O(1)
+        self._title_parts = []  # Фрагменты <title>, склеиваются один раз при чтении title
+        self.description = ""
+        self.in_title = False
+        # Содержимое блока courses-right-side
         self.headers = []
+        self.header_texts = set()  # Тексты заголовков без префикса "#" для отсева повторов
         self.text_content = []
         self.current_tag = None
-        self.in_script = False
-        self.in_style = False
+        # Глубина вложенности script/style (счетчики вместо флагов)
+        self.in_script = 0
+        self.in_style = 0
         self.in_courses_right_side = False
         self.div_nesting_level = 0  # Отслеживаем глубину вложенности div
+        # Текущая внешняя ссылка внутри courses-right-side (None - вне ссылки)
+        self.current_link_href = None
+        self.current_link_text = []  # Фрагменты текста ссылки, склеиваются на </a>
+        # HTTP-валидаторы ответа (ETag, Last-Modified) для условных запросов при повторном запуске
+        self.etag = None
+        self.last_modified = None
+        self._content_digest = None
         
     def handle_starttag(self, tag, attrs):
         self.current_tag = tag
         
-        if tag in ['script', 'style']:
-            setattr(self, f'in_{tag}', True)
+        if tag == 'script':
+            self.in_script += 1
+        elif tag == 'style':
+            self.in_style += 1
+        elif tag == 'title':
+            self.in_title = True
+        elif tag == 'meta' and not self.description:
+            # Описание курса берем из <meta name="description"> за тот же проход
+            attrs_dict = dict(attrs)
+            if (attrs_dict.get('name') or '').lower() == 'description':
+                self.description = (attrs_dict.get('content') or '').strip()
         elif tag == 'div':
+            if self.in_courses_right_side:
+                # Мы внутри courses-right-side и нашли еще один div: классы не проверяем,
+                # достаточно учесть вложенность
+                self.div_nesting_level += 1
+                return
+            
             # Проверяем наличие класса courses-right-side
-            has_courses_right_side = False
             for attr_name, attr_value in attrs:
-                if attr_name == 'class' and 'courses-right-side' in attr_value:
-                    has_courses_right_side = True
+                if attr_name == 'class' and attr_value and 'courses-right-side' in attr_value:
+                    self.in_courses_right_side = True
+                    self.div_nesting_level = 1  # Начинаем отслеживать вложенность с уровня 1
                     break
-            
-            if has_courses_right_side:
-                self.in_courses_right_side = True
-                self.div_nesting_level = 1  # Начинаем отслеживать вложенность с уровня 1
-            elif self.in_courses_right_side:
-                # Мы внутри courses-right-side и нашли еще один div
-                self.div_nesting_level += 1
-        elif tag == 'a' and not self.in_script and not self.in_style:
+        elif tag == 'a':
             href = None
             for attr_name, attr_value in attrs:
                 if attr_name == 'href':
                     href = attr_value
-            if href and href.startswith('http'):
+                    break
+            if not href:
+                return
+            
+            # Проверяем ссылки связанные с уроками одним скомпилированным выражением,
+            # пропуская CSS и другие не относящиеся к контенту ссылки
+            if (self._page_url and _LESSON_HREF_RE.search(href)
+                    and not _SKIPPED_HREF_RE.search(href)):
+                self.add_link(href)
+            
+            # Текст внешних ссылок из courses-right-side попадает в Markdown
+            if (self.in_courses_right_side and not self.in_script and not self.in_style
+                    and href.startswith('http')):
                 self.current_link_href = href
-                self.current_link_text = ""
+                self.current_link_text.clear()
+    
+    def add_link(self, href):
+        """Добавление ссылки на урок в виде абсолютного URL, если ее еще не было"""
+        # Преобразуем относительные URL в абсолютные
+        if href.startswith('/'):
+            full_url = self._base_url + href
+        elif href.startswith('http'):
+            full_url = href
+        else:
+            full_url = urllib.parse.urljoin(self._page_url, href)
+        
+        if full_url not in self._seen_links:
+            self._seen_links.add(full_url)
+            self.links.append(full_url)
     
     def handle_data(self, data):
-        if self.in_script or self.in_style:
+        if self.in_title:
+            self._title_parts.append(data.strip())
+        
+        # Сохраняем только контент из courses-right-side блока.
+        # Дешевые проверки флагов выполняем до strip(), чтобы не создавать
+        # лишние строки для всего текста страницы вне блока
+        if not self.in_courses_right_side or self.in_script or self.in_style:
             return
             
         text = data.strip()
         if not text:
             return
             
-        # Сохраняем только контент из courses-right-side блока
-        if not self.in_courses_right_side:
-            return
-            
-        if self.current_tag in ['h1', 'h2', 'h3', 'h4', 'h5', 'h6']:
-            level = int(self.current_tag[1]) + 1  # Смещаем уровень на 1
+        level = _HEADER_LEVELS.get(self.current_tag)
+        if level:
             self.headers.append(f"{'#' * level} {text}")
-        elif hasattr(self, 'current_link_href'):
-            self.current_link_text += text
-        else:
+            self.header_texts.add(text)
+        elif self.current_link_href is not None:
+            self.current_link_text.append(text)
+        elif len(text) > 1:
+            # Строки из одного символа в Markdown не попадают, отбрасываем сразу
             self.text_content.append(text)
     
     def handle_endtag(self, tag):
-        if tag in ['script', 'style']:
-            setattr(self, f'in_{tag}', False)
+        if tag == 'script':
+            if self.in_script:
+                self.in_script -= 1
+        elif tag == 'style':
+            if self.in_style:
+                self.in_style -= 1
+        elif tag == 'title':
+            self.in_title = False
         elif tag == 'div' and self.in_courses_right_side:
             # Уменьшаем уровень вложенности при закрытии div внутри courses-right-side
             self.div_nesting_level -= 1
             # Выходим из courses-right-side только когда закрываем основной div (уровень 0)
             if self.div_nesting_level == 0:
                 self.in_courses_right_side = False
-        elif tag == 'a' and hasattr(self, 'current_link_href'):
+        elif tag == 'a' and self.current_link_href is not None:
             if self.current_link_text:
                 # Добавляем только текст ссылки как жирный текст, без URL
-                bold_text = f"**{self.current_link_text.strip()}**"
+                # (фрагменты уже очищены от пробелов в handle_data)
+                bold_text = f"**{''.join(self.current_link_text)}**"
                 self.text_content.append(bold_text)
-            delattr(self, 'current_link_href')
-            if hasattr(self, 'current_link_text'):
-                delattr(self, 'current_link_text')
+            self.current_link_href = None
+            self.current_link_text.clear()
         
         self.current_tag = None
     
-    def get_markdown_content(self, url, title="Без названия"):
-        md_lines = []
-        
+    @property
+    def title(self):
+        """Заголовок страницы из <title>"""
+        return "".join(self._title_parts)
+    
+    def iter_markdown_lines(self, url, title="Без названия"):
+        """Строки Markdown-документа страницы по одной, без промежуточного списка"""
         # Добавляем заголовок страницы
-        md_lines.append(f"# {title}")
-        md_lines.append("")
+        yield f"# {title}"
+        yield ""
         
         # Добавляем метаданные
-        md_lines.append("## Метаданные")
-        md_lines.append("")
-        md_lines.append(f"- **URL:** {url}")
-        md_lines.append("")
-        md_lines.append("---")
-        md_lines.append("")
+        yield "## Метаданные"
+        yield ""
+        yield f"- **URL:** {url}"
+        yield ""
+        yield "---"
+        yield ""
         
         # Добавляем содержимое
-        md_lines.append("## Содержимое")
-        md_lines.append("")
+        yield "## Содержимое"
+        yield ""
         
         # Добавляем заголовки
         if self.headers:
-            md_lines.extend(self.headers)
-            md_lines.append("")
+            yield from self.headers
+            yield ""
         
         # Добавляем основной текст
         if self.text_content:
-            md_lines.append("### Основной текст")
-            md_lines.append("")
-            cleaned_lines = []
-            for line in self.text_content:
-                line = line.strip()
-                if line and len(line) > 1:
-                    # Избегаем дублирования заголовков
-                    is_header = False
-                    for header in self.headers:
-                        if line in header:
-                            is_header = True
-                            break
-                    if not is_header:
-                        cleaned_lines.append(line)
-            md_lines.extend(cleaned_lines)
-        
-        return '\n'.join(md_lines)
+            yield "### Основной текст"
+            yield ""
+            # Строки уже очищены в handle_data, остается убрать повторы заголовков
+            header_texts = self.header_texts
+            yield from (line for line in self.text_content if line not in header_texts)
+    
+    def get_markdown_content(self, url, title="Без названия"):
+        return '\n'.join(self.iter_markdown_lines(url, title))
+    
+    def content_digest(self):
+        """
+        Хэш содержимого блока courses-right-side (заголовки и текст без URL
+        и названия страницы) для поиска страниц с одинаковым содержимым
+        
+        Returns:
+            bytes: Дайджест BLAKE2b (16 байт)
+        """
+        if self._content_digest is not None:
+            return self._content_digest
+        digest = hashlib.blake2b(digest_size=16)
+        for line in self.headers:
+            digest.update(line.encode('utf-8'))
+            digest.update(b'\n')
+        digest.update(b'\0')
+        for line in self.text_content:
+            digest.update(line.encode('utf-8'))
+            digest.update(b'\n')
+        self._content_digest = digest.digest()
+        return self._content_digest
     
     def has_courses_right_side_content(self):
         """
@@ -234,8 +538,154 @@ class MarkdownExtractorParser(html.parser.HTMLParser):
         return bool(self.headers or self.text_content)
 
 
+class VisitedPagesCache:
+    """
+    Сохраненные страницы между запусками парсера (SQLite в директории вывода).
+    Для каждого URL хранятся ETag, Last-Modified, путь к сохраненному файлу
+    и хэш содержимого, чтобы при повторном запуске запрашивать страницу условно
+    (If-None-Match / If-Modified-Since) и не скачивать заново неизмененные уроки.
+    Для страниц, не сохраненных из-за совпадения содержимого, вместо пути
+    хранится URL исходной страницы (duplicate_of).
+    Одно соединение используется всеми потоками загрузки под блокировкой.
+    """
+    def __init__(self, path, base_dir):
+        self.base_dir = base_dir
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS visited('
+            'url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, path TEXT, '
+            'digest BLOB, duplicate_of TEXT)'
+        )
+        # Кэш, созданный предыдущей версией парсера, дополняем новыми столбцами
+        columns = {row[1] for row in self._db.execute('PRAGMA table_info(visited)')}
+        for column, column_type in (('digest', 'BLOB'), ('duplicate_of', 'TEXT')):
+            if column not in columns:
+                self._db.execute(f'ALTER TABLE visited ADD COLUMN {column} {column_type}')
+    
+    def conditional_headers(self, url):
+        """
+        Заголовки условного запроса для ранее сохраненной страницы
+        
+        Args:
+            url: URL страницы
+            
+        Returns:
+            dict: If-None-Match / If-Modified-Since или пустой словарь, если страница
+            не сохранялась, сервер не прислал валидаторов или файл был удален
+        """
+        # Для повторяющейся страницы проверяем файл исходной страницы
+        with self._lock:
+            row = self._db.execute(
+                'SELECT v.etag, v.last_modified, '
+                'CASE WHEN v.duplicate_of IS NULL THEN v.path ELSE o.path END '
+                'FROM visited v LEFT JOIN visited o ON o.url = v.duplicate_of '
+                'WHERE v.url = ?', (url,)
+            ).fetchone()
+        if not row:
+            return {}
+        etag, last_modified, path = row
+        if not path or not os.path.isfile(os.path.join(self.base_dir, path)):
+            return {}
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        return headers
+    
+    def record(self, url, etag, last_modified, path, digest=None, duplicate_of=None):
+        """
+        Запоминает страницу, ее валидаторы и хэш содержимого
+        
+        Args:
+            url: URL страницы
+            etag: Значение ETag ответа или None
+            last_modified: Значение Last-Modified ответа или None
+            path: Путь к сохраненному файлу или None для повторяющейся страницы
+            digest: Хэш содержимого (CoursePageParser.content_digest)
+            duplicate_of: URL страницы с тем же содержимым, если эта не сохранялась
+        """
+        if path:
+            path = os.path.relpath(path, self.base_dir)
+        with self._lock:
+            self._db.execute(
+                'INSERT OR REPLACE INTO visited(url, etag, last_modified, path, digest, duplicate_of) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (url, etag, last_modified, path, digest, duplicate_of)
+            )
+    
+    def saved_digests(self):
+        """
+        Хэши содержимого страниц, файлы которых сохранены и не удалены
+        
+        Returns:
+            dict: Хэш содержимого -> URL сохраненной страницы
+        """
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT digest, url, path FROM visited '
+                'WHERE digest IS NOT NULL AND duplicate_of IS NULL AND path IS NOT NULL'
+            ).fetchall()
+        return {
+            bytes(digest): url for digest, url, path in rows
+            if os.path.isfile(os.path.join(self.base_dir, path))
+        }
+    
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class RequestRateLimiter:
+    """
+    Ограничитель частоты запросов, общий для всех потоков загрузки.
+    Выдает разрешения на запрос не чаще одного раза в interval секунд,
+    поэтому вежливая пауза сохраняется и при параллельной загрузке.
+    
+    Пауза адаптивная (AIMD): на ответы 429/503 она удваивается, а после
+    каждого успешного запроса уменьшается на фиксированный шаг, но не ниже
+    заданного пользователем таймаута.
+    """
+    def __init__(self, interval):
+        self.min_interval = interval
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._next_time = 0.0
+    
+    def record_success(self):
+        """Аддитивное ускорение после успешного запроса"""
+        with self._lock:
+            if self.interval > self.min_interval:
+                self.interval = max(self.min_interval, self.interval - THROTTLE_RECOVERY_STEP)
+    
+    def record_throttle(self):
+        """
+        Мультипликативное замедление, когда сервер просит снизить нагрузку
+        
+        Returns:
+            float: Новая пауза между запросами в секундах
+        """
+        with self._lock:
+            self.interval = min(
+                THROTTLE_MAX_INTERVAL,
+                max(self.interval * 2, THROTTLE_MIN_INTERVAL)
+            )
+            return self.interval
+    
+    def wait(self):
+        """Блокирует поток до момента, когда разрешен следующий запрос"""
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next_time - now
+            self._next_time = max(now, self._next_time) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
 class BitrixCourseParser:
-    def __init__(self, start_url, output_dir="./course_data", page_limit=None, timeout=0.5, retries=5):
+    def __init__(self, start_url, output_dir="./course_data", page_limit=None, timeout=0.5, retries=5,
+                 concurrency=4):
         """
         Инициализация парсера
         
@@ -245,93 +695,281 @@ class BitrixCourseParser:
             page_limit: Максимальное количество страниц для скачивания
             timeout: Таймаут между скачиваниями в секундах
             retries: Количество попыток скачивания при ошибке
+            concurrency: Количество одновременных загрузок уроков
         """
         self.start_url = start_url
         self.output_dir = output_dir
         self.page_limit = page_limit
         self.timeout = timeout
         self.retries = retries
+        self.concurrency = max(1, concurrency)
+        
+        # Идентификаторы из уже разобранных URL: ссылки уроков разбираются при
+        # построении списка уроков и повторно используются при сохранении страниц
+        self._url_ids_cache = {}
+        self.start_url_ids = self.get_url_ids(start_url)
         self.downloaded_pages = 0
         self.visited_urls = set()
+        self.rate_limiter = RequestRateLimiter(timeout)
+        # Нумерация сохраняемых страниц (save_page_content вызывается из разных потоков)
+        self._page_number = 0
+        self._page_number_lock = threading.Lock()
+        
+        # Постоянные (keep-alive) соединения: у каждого потока загрузки свои
+        self._thread_local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        # При настроенном прокси загружаем через urllib, который его учитывает
+        self._proxies = urllib.request.getproxies()
+        # Уже созданные директории курсов: makedirs вызывается один раз на директорию
+        self._created_dirs = set()
         
         # Создаем директорию для вывода
         os.makedirs(output_dir, exist_ok=True)
         
+        # Страницы, сохраненные предыдущими запусками в эту же директорию
+        self.visited_cache = VisitedPagesCache(
+            os.path.join(output_dir, VISITED_CACHE_FILENAME), output_dir
+        )
+        # Хэши содержимого сохраненных страниц -> URL страницы, занявшей хэш первой
+        # (включая страницы, сохраненные предыдущими запусками)
+        self._saved_content_digests = self.visited_cache.saved_digests()
+        self._saved_content_digests_lock = threading.Lock()
+        
+    def next_page_number(self):
+        """Порядковый номер сохраняемой страницы, безопасно для нескольких потоков"""
+        with self._page_number_lock:
+            self._page_number += 1
+            return self._page_number
+    
+    def ensure_dir(self, path):
+        """Создание директории при первом обращении к ней за время работы парсера"""
+        if path not in self._created_dirs:
+            os.makedirs(path, exist_ok=True)
+            self._created_dirs.add(path)
+    
+    def get_url_ids(self, url):
+        """
+        Идентификаторы COURSE_ID, LESSON_ID и CHAPTER_ID из параметров URL
+        
+        Вместо полного разбора строки запроса (parse_qs) нужные параметры
+        извлекаются одним скомпилированным выражением, результат кэшируется по URL.
+        
+        Args:
+            url: Абсолютный URL
+            
+        Returns:
+            dict: Имя параметра -> значение (при повторах берется первое)
+        """
+        url_ids = self._url_ids_cache.get(url)
+        if url_ids is None:
+            url_ids = {}
+            for name, value in _URL_ID_RE.findall(url.partition('#')[0]):
+                if '%' in value or '+' in value:
+                    value = urllib.parse.unquote_plus(value)
+                url_ids.setdefault(name, value)
+            self._url_ids_cache[url] = url_ids
+        return url_ids
+    
     def sanitize_filename(self, filename):
-        """Очистка имени файла от недопустимых символов"""
-        filename = re.sub(r'[<>:"/\\|?*]', '_', filename)
+        """
+        Очистка имени файла от недопустимых символов
+        
+        Длинные названия обрезаются по границе символа до MAX_FILENAME_TITLE_BYTES
+        байт UTF-8 (кириллица занимает 2 байта на символ) и получают суффикс
+        с хэшем полного названия, чтобы разные уроки с общим началом
+        названия не перезаписывали файлы друг друга.
+        """
+        filename = filename.translate(_INVALID_FILENAME_CHARS_TABLE)
         filename = filename.strip().strip('.')
-        return filename[:200]  # Ограничиваем длину имени файла
+        
+        encoded = filename.encode('utf-8')
+        if len(encoded) <= MAX_FILENAME_TITLE_BYTES:
+            return filename
+        
+        digest = hashlib.blake2s(encoded, digest_size=4).hexdigest()
+        truncated = encoded[:MAX_FILENAME_TITLE_BYTES - len(digest) - 1]
+        truncated = truncated.decode('utf-8', errors='ignore').rstrip().rstrip('.')
+        return f"{truncated}-{digest}"
     
-    def get_page_content(self, url):
+    def get_connection(self, scheme, netloc):
+        """
+        Постоянное соединение с хостом для текущего потока
+        
+        Соединение переиспользуется для всех запросов потока к этому хосту,
+        поэтому TCP и TLS рукопожатия выполняются один раз, а не на каждую страницу.
+        
+        Args:
+            scheme: Схема URL (http или https)
+            netloc: Хост и порт
+            
+        Returns:
+            http.client.HTTPConnection или HTTPSConnection
+        """
+        connections = getattr(self._thread_local, 'connections', None)
+        if connections is None:
+            connections = self._thread_local.connections = {}
+        
+        key = (scheme, netloc)
+        conn = connections.get(key)
+        if conn is None:
+            if scheme == 'https':
+                conn = http.client.HTTPSConnection(netloc, timeout=REQUEST_TIMEOUT)
+            else:
+                conn = http.client.HTTPConnection(netloc, timeout=REQUEST_TIMEOUT)
+            connections[key] = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+    
+    def reset_thread_connections(self):
+        """
+        Закрытие соединений текущего потока
+        
+        Вызывается, когда тело ответа прочитано не полностью: такое
+        соединение нельзя использовать для следующего запроса.
+        """
+        connections = getattr(self._thread_local, 'connections', None)
+        if connections:
+            for conn in connections.values():
+                conn.close()
+    
+    def close_connections(self):
+        """Закрытие всех постоянных соединений"""
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+    
+    def open_url(self, url, extra_headers=None):
+        """
+        Выполнение GET запроса по постоянному соединению
+        
+        Следует перенаправлениям, а на остальные статусы кроме 2xx (включая
+        304 Not Modified) выбрасывает urllib.error.HTTPError, как urllib.request.urlopen.
+        
+        Args:
+            url: URL страницы
+            extra_headers: Дополнительные заголовки запроса (например, условного)
+            
+        Returns:
+            http.client.HTTPResponse с заголовками и телом ответа
+        """
+        headers = REQUEST_HEADERS
+        if extra_headers:
+            headers = {**REQUEST_HEADERS, **extra_headers}
+        
+        scheme = urllib.parse.urlsplit(url).scheme
+        if scheme not in ('http', 'https') or scheme in self._proxies:
+            req = urllib.request.Request(url, headers=headers)
+            return urllib.request.urlopen(req, timeout=REQUEST_TIMEOUT)
+        
+        for _ in range(MAX_REDIRECTS + 1):
+            parsed = urllib.parse.urlsplit(url)
+            path = parsed.path or '/'
+            if parsed.query:
+                path += '?' + parsed.query
+            
+            conn = self.get_connection(parsed.scheme, parsed.netloc)
+            try:
+                try:
+                    conn.request('GET', path, headers=headers)
+                    response = conn.getresponse()
+                except ConnectionError:
+                    # Сервер закрыл простаивающее соединение - открываем новое и повторяем
+                    conn.close()
+                    conn.request('GET', path, headers=headers)
+                    response = conn.getresponse()
+            except (OSError, http.client.HTTPException) as e:
+                conn.close()
+                raise urllib.error.URLError(e)
+            
+            if response.status in (301, 302, 303, 307, 308) and response.getheader('Location'):
+                # Дочитываем тело, чтобы соединение можно было использовать дальше
+                response.read()
+                url = urllib.parse.urljoin(url, response.getheader('Location'))
+                continue
+            
+            if response.status >= 300:
+                response.read()
+                raise urllib.error.HTTPError(url, response.status, response.reason, response.headers, None)
+            
+            return response
+        
+        raise urllib.error.URLError(f"слишком много перенаправлений ({MAX_REDIRECTS})")
+    
+    def get_page_content(self, url, conditional=False, collect_links=False):
         """
         Получение содержимого страницы с поддержкой повторных попыток
         
         Args:
             url: URL страницы
+            conditional: Запрашивать условно, если страница уже сохранена прошлым запуском
+            collect_links: Собирать ссылки на уроки (нужно только для начальной страницы)
             
         Returns:
-            (parser, content) или (None, None) в случае ошибки
+            CoursePageParser с разобранной страницей, PAGE_NOT_MODIFIED если
+            страница не изменилась, или None в случае ошибки
         """
         last_exception = None
+        retry_after = None
+        extra_headers = self.visited_cache.conditional_headers(url) if conditional else None
         
         for attempt in range(self.retries):
             try:
                 if attempt > 0:
-                    # Экспоненциальная задержка: 1, 2, 4, 8 секунд...
-                    delay = 2 ** (attempt - 1)
+                    # Экспоненциальная задержка: 0.5, 1, 2, 4 секунды...
+                    delay = RETRY_BACKOFF_FACTOR * 2 ** (attempt - 1)
+                    # Сервер может явно указать, сколько ждать (429/503)
+                    if retry_after is not None:
+                        delay = max(delay, retry_after)
+                        retry_after = None
                     print(f"Повторная попытка {attempt + 1}/{self.retries} через {delay} сек...")
                     time.sleep(delay)
                 
                 print(f"Загружаем: {url}")
                 
-                # Создаем запрос с заголовками браузера
-                req = urllib.request.Request(
-                    url,
-                    headers={
-                        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-                        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-                        'Accept-Language': 'ru-RU,ru;q=0.9,en;q=0.8',
-                        'Accept-Encoding': 'gzip, deflate',
-                        'Connection': 'keep-alive',
-                        'Upgrade-Insecure-Requests': '1',
-                    }
-                )
-                
-                with urllib.request.urlopen(req, timeout=30) as response:
-                    # Читаем необработанный контент
-                    raw_content = response.read()
-                
-                    # Пытаемся распаковать если сжато gzip
+                with self.open_url(url, extra_headers) as response:
+                    # Парсим HTML за один проход по мере чтения: блоки ответа
+                    # распаковываются, декодируются и сразу передаются парсеру,
+                    # текст страницы целиком в памяти не собирается. Границы фрагментов
+                    # выравниваются по тегам, чтобы не разбивать текстовые узлы.
+                    # HTML сущности в тексте и атрибутах декодирует сам HTMLParser
+                    parser = CoursePageParser(url if collect_links else None)
                     try:
-                        if response.headers.get('Content-Encoding') == 'gzip':
-                            content = gzip.decompress(raw_content).decode('utf-8', errors='ignore')
-                        else:
-                            # Пытаемся gzip в любом случае если заголовок отсутствует
-                            try:
-                                content = gzip.decompress(raw_content).decode('utf-8', errors='ignore')
-                            except:
-                                content = raw_content.decode('utf-8', errors='ignore')
-                    except Exception as e:
-                        content = raw_content.decode('utf-8', errors='ignore')
-                
-                    # Декодируем HTML сущности
-                    content = html.unescape(content)
-                
-                    # Парсим HTML
-                    parser = SimpleHTMLParser()
-                    parser.feed(content)
+                        for text in iter_tag_aligned_text(iter_response_text(response)):
+                            parser.feed(text)
+                    except Exception:
+                        self.reset_thread_connections()
+                        raise
+                    parser.close()
+                    parser.etag = response.headers.get('ETag')
+                    parser.last_modified = response.headers.get('Last-Modified')
                 
+                    self.rate_limiter.record_success()
                     if attempt > 0:
                         print(f"✅ Успешно загружено с попытки {attempt + 1}")
                 
-                    return parser, content
+                    return parser
                     
             except urllib.error.HTTPError as e:
+                if e.code == 304:
+                    self.rate_limiter.record_success()
+                    return PAGE_NOT_MODIFIED
                 last_exception = e
                 print(f"HTTP ошибка при загрузке {url}: {e.code} - {e.reason}")
-                if e.code in [404, 403, 401]:  # Не повторяем для ошибок клиента
+                if e.code not in RETRY_STATUS_CODES:  # Повторяем только временные ошибки
                     break
+                if e.code in THROTTLE_STATUS_CODES:
+                    interval = self.rate_limiter.record_throttle()
+                    print(f"Сервер просит снизить частоту запросов, пауза между запросами: {interval:.2f} сек")
+                retry_after_header = (e.headers.get('Retry-After') or '').strip() if e.headers else ''
+                if retry_after_header.isdigit():
+                    retry_after = int(retry_after_header)
+            except ResponseTooLargeError as e:
+                last_exception = e
+                print(f"Страница {url} пропущена: {e}")
+                break  # Повторная загрузка вернет тот же ответ
             except urllib.error.URLError as e:
                 last_exception = e
                 print(f"Ошибка URL при загрузке {url}: {e.reason}")
@@ -341,86 +979,77 @@ class BitrixCourseParser:
         
         # Все попытки исчерпаны
         print(f"❌ Не удалось загрузить {url} после {self.retries} попыток")
-        return None, None
+        return None
     
     def extract_course_info(self, parser):
         """
         Извлечение информации о курсе
         
         Args:
-            parser: SimpleHTMLParser object
+            parser: CoursePageParser object
             
         Returns:
             dict с информацией о курсе
         """
         course_info = {
             'title': parser.title or 'Курс Bitrix',
-            'description': '',
+            'description': parser.description,
             'lessons': [],
             'metadata': {}
         }
         
-        # Обрабатываем найденные ссылки
-        print(f"Отладка: найдено {len(parser.links)} сырых ссылок")
+        # Ссылки уже абсолютные и без повторов (см. CoursePageParser.add_link)
         lesson_links = []
-        base_url = f"{urllib.parse.urlparse(self.start_url).scheme}://{urllib.parse.urlparse(self.start_url).netloc}"
-        
-        for href in parser.links:
-            if href:
-                # Преобразуем относительные URL в абсолютные
-                if href.startswith('/'):
-                    full_url = base_url + href
-                elif href.startswith('http'):
-                    full_url = href
-                else:
-                    full_url = urllib.parse.urljoin(self.start_url, href)
-                
-                # Генерируем заголовок на основе параметров URL
-                parsed_url = urllib.parse.urlparse(full_url)
-                query_params = urllib.parse.parse_qs(parsed_url.query)
-                
-                title_parts = []
-                if 'LESSON_ID' in query_params:
-                    title_parts.append(f"Урок {query_params['LESSON_ID'][0]}")
-                elif 'CHAPTER_ID' in query_params:
-                    title_parts.append(f"Глава {query_params['CHAPTER_ID'][0]}")
-                else:
-                    title_parts.append("Урок")
-                
-                title = " ".join(title_parts)
-                
-                if full_url not in [l['url'] for l in lesson_links]:
-                    lesson_links.append({
-                        'title': title,
-                        'url': full_url
-                    })
+        
+        for full_url in parser.links:
+            # Генерируем заголовок на основе параметров URL
+            url_ids = self.get_url_ids(full_url)
+            
+            title_parts = []
+            if 'LESSON_ID' in url_ids:
+                title_parts.append(f"Урок {url_ids['LESSON_ID']}")
+            elif 'CHAPTER_ID' in url_ids:
+                title_parts.append(f"Глава {url_ids['CHAPTER_ID']}")
+            else:
+                title_parts.append("Урок")
+            
+            title = " ".join(title_parts)
+            
+            lesson_links.append({
+                'title': title,
+                'url': full_url
+            })
         
         course_info['lessons'] = lesson_links
         return course_info
     
-    def save_page_content(self, url, parser, content, page_info=None):
+    def save_page_content(self, url, parser, page_info=None):
         """
         Сохранение содержимого страницы в формате MD
         
         Args:
             url: URL страницы
-            parser: SimpleHTMLParser object
-            content: Сырое содержимое HTML
+            parser: CoursePageParser object с уже разобранной страницей
             page_info: Дополнительная информация о странице
+            
+        Returns:
+            str: Путь к сохраненному файлу или None, если страница не сохранена
         """
+        # Номер страницы по порядку сохранения (используется, если в URL нет ID)
+        page_number = self.next_page_number()
+        
         try:
             # Создаем имя файла на основе URL
-            parsed_url = urllib.parse.urlparse(url)
-            query_params = urllib.parse.parse_qs(parsed_url.query)
+            url_ids = self.get_url_ids(url)
             
             filename_parts = []
-            if 'COURSE_ID' in query_params:
-                filename_parts.append(f"course_{query_params['COURSE_ID'][0]}")
-            if 'LESSON_ID' in query_params:
-                filename_parts.append(f"lesson_{query_params['LESSON_ID'][0]}")
+            if 'COURSE_ID' in url_ids:
+                filename_parts.append(f"course_{url_ids['COURSE_ID']}")
+            if 'LESSON_ID' in url_ids:
+                filename_parts.append(f"lesson_{url_ids['LESSON_ID']}")
             
             if not filename_parts:
-                filename_parts.append(f"page_{self.downloaded_pages + 1}")
+                filename_parts.append(f"page_{page_number}")
             
             if page_info and page_info.get('title'):
                 safe_title = self.sanitize_filename(page_info['title'])
@@ -428,43 +1057,87 @@ class BitrixCourseParser:
             
             base_filename = "_".join(filename_parts)
             
-            # Извлекаем содержимое в формате Markdown
-            md_parser = MarkdownExtractorParser()
-            md_parser.feed(content)
-            
             # Проверяем, был ли найден блок courses-right-side с контентом
-            if not md_parser.has_courses_right_side_content():
+            if not parser.has_courses_right_side_content():
                 print(f"Пропускаем сохранение страницы {url}: блок courses-right-side не найден или пуст")
                 return
             
+            # Одно и то же содержимое бывает доступно по разным URL (например, глава
+            # и ее урок) - сохраняем его только один раз. Хэш занимается до записи
+            # файла, чтобы две одинаковые страницы из разных потоков не сохранились
+            # обе; при параллельной загрузке сохраняется та, что разобрана первой,
+            # поэтому в рамках первого запуска это не обязательно первый урок списка
+            content_digest = parser.content_digest()
+            with self._saved_content_digests_lock:
+                original_url = self._saved_content_digests.setdefault(content_digest, url)
+            if original_url != url:
+                print(f"Пропускаем сохранение страницы {url}: содержимое совпадает со страницей {original_url}")
+                return
+            
             title = page_info.get('title', parser.title) if page_info else parser.title
             if not title:
                 title = "Без названия"
             
-            md_content = md_parser.get_markdown_content(url, title)
+            md_content = parser.get_markdown_content(url, title)
+            # Кодируем один раз и пишем в бинарном режиме: без построчного
+            # перекодирования и преобразования переводов строк текстового режима
+            md_data = md_content.encode('utf-8')
             
             # Сохраняем в папку соответствующую названию курса
-            if 'COURSE_ID' in query_params:
-                course_id = query_params['COURSE_ID'][0]
-                course_subdir = os.path.join(self.output_dir, f"course_{course_id}")
-                os.makedirs(course_subdir, exist_ok=True)
-                
-                course_md_filename = os.path.join(course_subdir, f"{base_filename}.md")
-                with open(course_md_filename, 'w', encoding='utf-8') as f:
-                    f.write(md_content)
-            else:
-                # Если ID курса не удалось определить, сохраняем в папку data/course
-                course_subdir = os.path.join(self.output_dir, "course")
-                os.makedirs(course_subdir, exist_ok=True)
-                
-                course_md_filename = os.path.join(course_subdir, f"{base_filename}.md")
-                with open(course_md_filename, 'w', encoding='utf-8') as f:
-                    f.write(md_content)
+            try:
+                if 'COURSE_ID' in url_ids:
+                    course_id = url_ids['COURSE_ID']
+                    course_subdir = os.path.join(self.output_dir, f"course_{course_id}")
+                    self.ensure_dir(course_subdir)
+                    
+                    course_md_filename = os.path.join(course_subdir, f"{base_filename}.md")
+                    write_file_atomic(course_md_filename, md_data)
+                else:
+                    # Если ID курса не удалось определить, сохраняем в папку data/course
+                    course_subdir = os.path.join(self.output_dir, "course")
+                    self.ensure_dir(course_subdir)
+                    
+                    course_md_filename = os.path.join(course_subdir, f"{base_filename}.md")
+                    write_file_atomic(course_md_filename, md_data)
+            except Exception:
+                # Файл не записан - освобождаем хэш для других страниц с тем же содержимым
+                with self._saved_content_digests_lock:
+                    if self._saved_content_digests.get(content_digest) == url:
+                        del self._saved_content_digests[content_digest]
+                raise
             
             print(f"Сохранено в MD: {base_filename}")
+            return course_md_filename
             
         except Exception as e:
             print(f"Ошибка при сохранении страницы {url}: {e}")
+        return None
+    
+    def record_visited(self, url, parser, saved_path):
+        """
+        Запись страницы в кэш посещенных страниц после save_page_content
+        
+        Страница, пропущенная из-за совпадения содержимого, запоминается со ссылкой
+        на исходную страницу, чтобы при повторном запуске запрашиваться условно.
+        
+        Args:
+            url: URL страницы
+            parser: CoursePageParser с разобранной страницей
+            saved_path: Результат save_page_content
+        """
+        if not parser.has_courses_right_side_content():
+            return
+        content_digest = parser.content_digest()
+        if saved_path:
+            self.visited_cache.record(
+                url, parser.etag, parser.last_modified, saved_path, content_digest
+            )
+            return
+        original_url = self._saved_content_digests.get(content_digest)
+        if original_url is not None and original_url != url:
+            self.visited_cache.record(
+                url, parser.etag, parser.last_modified, None, content_digest, original_url
+            )
     
     def parse_course(self):
         """
@@ -476,13 +1149,16 @@ class BitrixCourseParser:
             print(f"Ограничение страниц: {self.page_limit}")
         
         # Загружаем начальную страницу
-        parser, content = self.get_page_content(self.start_url)
+        self.rate_limiter.wait()
+        parser = self.get_page_content(self.start_url, collect_links=True)
         if not parser:
             print("Не удалось загрузить начальную страницу")
+            self.close_connections()
+            self.visited_cache.close()
             return
         
         # Извлекаем информацию о курсе
-        print(f"Отладка: найдено {len(parser.links)} сырых ссылок")
+        print(f"Отладка: найдено {len(parser.links)} ссылок на уроки")
         if parser.links:
             print(f"Первые 5 ссылок: {parser.links[:5]}")
         
@@ -491,60 +1167,39 @@ class BitrixCourseParser:
         print(f"Количество уроков: {len(course_info['lessons'])}")
         
         # Сохраняем в папку соответствующую названию курса
-        parsed_url = urllib.parse.urlparse(self.start_url)
-        query_params = urllib.parse.parse_qs(parsed_url.query)
+        url_ids = self.start_url_ids
         
-        if 'COURSE_ID' in query_params:
-            course_id = query_params['COURSE_ID'][0]
+        if 'COURSE_ID' in url_ids:
+            course_id = url_ids['COURSE_ID']
             course_subdir = os.path.join(self.output_dir, f"course_{course_id}")
-            os.makedirs(course_subdir, exist_ok=True)
+            self.ensure_dir(course_subdir)
             
             course_info_subfile = os.path.join(course_subdir, 'course_info.json')
-            with open(course_info_subfile, 'w', encoding='utf-8') as f:
-                json.dump(course_info, f, ensure_ascii=False, indent=2)
+            write_file_atomic(course_info_subfile, dump_json_bytes(course_info))
         else:
             # Если ID курса не удалось определить, сохраняем в папку data/course
             course_subdir = os.path.join(self.output_dir, "course")
-            os.makedirs(course_subdir, exist_ok=True)
+            self.ensure_dir(course_subdir)
             
             course_info_subfile = os.path.join(course_subdir, 'course_info.json')
-            with open(course_info_subfile, 'w', encoding='utf-8') as f:
-                json.dump(course_info, f, ensure_ascii=False, indent=2)
+            write_file_atomic(course_info_subfile, dump_json_bytes(course_info))
         
         # Сохраняем начальную страницу
-        self.save_page_content(
+        saved_path = self.save_page_content(
             self.start_url, 
             parser, 
-            content, 
             {'title': course_info['title'] or 'course_index'}
         )
+        self.record_visited(self.start_url, parser, saved_path)
         self.downloaded_pages += 1
         self.visited_urls.add(self.start_url)
         
         # Обрабатываем уроки
-        for i, lesson in enumerate(course_info['lessons']):
-            if self.page_limit and self.downloaded_pages >= self.page_limit:
-                print(f"Достигнуто ограничение в {self.page_limit} страниц")
-                break
-            
-            if lesson['url'] in self.visited_urls:
-                continue
-            
-            print(f"Обрабатываем урок {i+1}/{len(course_info['lessons'])}: {lesson['title']}")
-            
-            # Небольшая задержка между запросами
-            time.sleep(self.timeout)
-            
-            lesson_parser, lesson_content = self.get_page_content(lesson['url'])
-            if lesson_parser and lesson_content:
-                self.save_page_content(
-                    lesson['url'],
-                    lesson_parser,
-                    lesson_content,
-                    {'title': lesson['title']}
-                )
-                self.downloaded_pages += 1
-                self.visited_urls.add(lesson['url'])
+        try:
+            self.download_lessons(course_info['lessons'])
+        finally:
+            self.close_connections()
+            self.visited_cache.close()
         
         print(f"Парсинг завершен. Скачано страниц: {self.downloaded_pages}")
         print(f"Файлы сохранены в: {os.path.abspath(self.output_dir)}")
@@ -566,6 +1221,92 @@ class BitrixCourseParser:
                 print("⚠️  Курсы для карты не найдены")
         except Exception as e:
             print(f"❌ Ошибка при генерации карты курсов: {e}")
+    
+    def process_lesson(self, lesson):
+        """
+        Загрузка и сохранение страницы урока в рабочем потоке
+        
+        Разбор и запись файла выполняются тем же потоком сразу после загрузки,
+        поэтому работа с диском идет параллельно с загрузками других уроков.
+        
+        Args:
+            lesson: Словарь урока с ключами title и url
+            
+        Returns:
+            bool: True если страница загружена, False в случае ошибки
+        """
+        # Пауза между запросами общая для всех потоков
+        self.rate_limiter.wait()
+        lesson_parser = self.get_page_content(lesson['url'], conditional=True)
+        if lesson_parser is PAGE_NOT_MODIFIED:
+            print(f"Урок не изменился с прошлого запуска: {lesson['url']}")
+            return True
+        if not lesson_parser:
+            return False
+        
+        saved_path = self.save_page_content(
+            lesson['url'],
+            lesson_parser,
+            {'title': lesson['title']}
+        )
+        self.record_visited(lesson['url'], lesson_parser, saved_path)
+        return True
+    
+    def download_lessons(self, lessons):
+        """
+        Параллельная загрузка уроков с ограничением числа одновременных запросов
+        
+        Загрузка, разбор и сохранение выполняются в пуле потоков, а счетчики
+        downloaded_pages и visited_urls обновляются только в текущем потоке
+        по мере готовности страниц, поэтому блокировки для них не нужны.
+        Новые уроки ставятся в очередь только пока не исчерпано ограничение
+        страниц с учетом загрузок в работе.
+        
+        Args:
+            lessons: Список уроков из extract_course_info
+        """
+        total = len(lessons)
+        queue = iter(enumerate(lessons))
+        in_flight = {}
+        limit_reached = False
+        
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            while True:
+                # Заполняем пул до заданного количества одновременных загрузок
+                while len(in_flight) < self.concurrency and not limit_reached:
+                    if self.page_limit and self.downloaded_pages + len(in_flight) >= self.page_limit:
+                        if not in_flight:
+                            print(f"Достигнуто ограничение в {self.page_limit} страниц")
+                            limit_reached = True
+                        break
+                    
+                    next_item = next(queue, None)
+                    if next_item is None:
+                        limit_reached = True
+                        break
+                    
+                    i, lesson = next_item
+                    if lesson['url'] in self.visited_urls:
+                        continue
+                    
+                    print(f"Обрабатываем урок {i+1}/{total}: {lesson['title']}")
+                    in_flight[executor.submit(self.process_lesson, lesson)] = lesson
+                
+                if not in_flight:
+                    break
+                
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    lesson = in_flight.pop(future)
+                    try:
+                        downloaded = future.result()
+                    except Exception as e:
+                        # Ошибка одного урока не должна останавливать остальные загрузки
+                        print(f"Ошибка при обработке урока {lesson['url']}: {e}")
+                        continue
+                    if downloaded:
+                        self.downloaded_pages += 1
+                        self.visited_urls.add(lesson['url'])
 
 
 def main():
@@ -597,6 +1338,12 @@ def main():
         default=5,
         help='Количество попыток скачивания при ошибке (по умолчанию: 5)'
     )
+    parser.add_argument(
+        '--concurrency',
+        type=int,
+        default=4,
+        help='Количество одновременных загрузок (по умолчанию: 4)'
+    )
     
     args = parser.parse_args()
     
@@ -606,7 +1353,8 @@ def main():
         output_dir=args.output,
         page_limit=args.limit,
         timeout=args.timeout,
-        retries=args.retries
+        retries=args.retries,
+        concurrency=args.concurrency
     )
     
     try:
@@ -7,9 +7,156 @@
 import os
 import json
 import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
 
+# Необязательный быстрый парсер JSON, без него используется стандартный json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# Регулярные выражения для разбора MD файлов (компилируем один раз при загрузке модуля)
+_URL_RE = re.compile(r'- \*\*URL:\*\* (.+)')
+_LAST_MODIFIED_RE = re.compile(r'Дата последнего изменения: (\d{2}\.\d{2}\.\d{4})')
+_VIEWS_RE = re.compile(r'Просмотров: ([\d\s]+)')
+# Продолжение числа просмотров на следующей строке (\s в _VIEWS_RE захватывает переводы строк)
+_VIEWS_CONTINUATION_RE = re.compile(r'[\d\s]*')
+_COURSE_ID_RE = re.compile(r'course_(\d+)')
+
+# Максимальное количество основных разделов в метаданных курса
+MAX_SECTIONS = 8
+
+# Количество потоков для параллельного чтения заголовков из MD файлов
+TITLE_READ_WORKERS = 8
+
+# Маркер раздела содержимого в MD файлах урока
+CONTENT_SECTION_MARKER = '## Содержимое'
+
+# Файл кэша заголовков и метаданных MD файлов в директории курса
+MAP_CACHE_FILENAME = '.course_map_cache.json'
+
+# Загруженные кэши директорий курсов: путь к директории -> {'entries': {...}, 'dirty': bool}
+_COURSE_CACHES = {}
+_COURSE_CACHES_LOCK = threading.Lock()
+
+
+def load_json_file(json_file_path):
+    """
+    Чтение JSON файла (через orjson, если он установлен)
+    
+    Args:
+        json_file_path: Путь к JSON файлу
+        
+    Returns:
+        Разобранные данные
+    """
+    with open(json_file_path, 'rb') as f:
+        data = f.read()
+    if orjson:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def get_course_cache(course_path):
+    """
+    Кэш директории курса; при первом обращении загружается из MAP_CACHE_FILENAME
+    
+    Args:
+        course_path: Путь к директории курса
+        
+    Returns:
+        dict: {'entries': имя MD файла -> закэшированные значения, 'dirty': bool}
+    """
+    with _COURSE_CACHES_LOCK:
+        cache = _COURSE_CACHES.get(course_path)
+        if cache is None:
+            try:
+                entries = load_json_file(os.path.join(course_path, MAP_CACHE_FILENAME))
+            except (OSError, ValueError):
+                entries = None
+            if not isinstance(entries, dict):
+                entries = {}
+            cache = {'entries': entries, 'dirty': False}
+            _COURSE_CACHES[course_path] = cache
+        return cache
+
+
+def get_cached_md_value(md_file_path, key, extract):
+    """
+    Значение, извлеченное из MD файла, с кэшированием между запусками
+    
+    Файл перечитывается, только если изменились его время изменения или размер.
+    
+    Args:
+        md_file_path: Путь к MD файлу
+        key: Имя значения в кэше ('title', 'metadata')
+        extract: Функция извлечения значения из файла
+        
+    Returns:
+        Значение из кэша или результат extract(md_file_path)
+    """
+    try:
+        stat = os.stat(md_file_path)
+    except OSError:
+        return extract(md_file_path)
+    
+    course_path, md_file = os.path.split(md_file_path)
+    cache = get_course_cache(course_path)
+    entries = cache['entries']
+    entry = entries.get(md_file)
+    if (not isinstance(entry, dict) or entry.get('mtime_ns') != stat.st_mtime_ns
+            or entry.get('size') != stat.st_size):
+        entry = {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size}
+        entries[md_file] = entry
+    if key not in entry:
+        entry[key] = extract(md_file_path)
+        cache['dirty'] = True
+    return entry[key]
+
+
+def save_course_cache(course_path, md_files=None):
+    """
+    Атомарная запись кэша директории курса, если он изменился
+    
+    Args:
+        course_path: Путь к директории курса
+        md_files: Список MD файлов курса; записи удаленных файлов отбрасываются
+    """
+    with _COURSE_CACHES_LOCK:
+        cache = _COURSE_CACHES.get(course_path)
+        if cache is None:
+            return
+        entries = cache['entries']
+        if md_files is not None:
+            existing = set(md_files)
+            for md_file in [name for name in entries if name not in existing]:
+                del entries[md_file]
+                cache['dirty'] = True
+        if not cache['dirty']:
+            return
+        if orjson:
+            data = orjson.dumps(entries)
+        else:
+            data = json.dumps(entries, ensure_ascii=False).encode('utf-8')
+        cache['dirty'] = False
+    
+    cache_path = os.path.join(course_path, MAP_CACHE_FILENAME)
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"Не удалось сохранить кэш карты курсов в {course_path}: {e}")
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
 
 def extract_metadata_from_md(md_file_path):
     """
@@ -22,31 +169,60 @@ def extract_metadata_from_md(md_file_path):
         dict: Словарь с метаданными (url, views, last_modified)
     """
     metadata = {}
+    sections = []
+    views_str = None  # Число просмотров, пока его запись может продолжаться на следующих строках
+    
+    def finish_views(views_str):
+        views_str = views_str.replace(' ', '')
+        metadata['views'] = int(views_str) if views_str.isdigit() else 0
     
     try:
+        # Один проход по строкам файла с остановкой, когда найдено все нужное
         with open(md_file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-            
-        # Извлекаем URL из раздела Метаданные
-        url_match = re.search(r'- \*\*URL:\*\* (.+)', content)
-        if url_match:
-            metadata['url'] = url_match.group(1)
-            
-        # Извлекаем дату последнего изменения
-        date_match = re.search(r'Дата последнего изменения: (\d{2}\.\d{2}\.\d{4})', content)
-        if date_match:
-            metadata['last_modified'] = date_match.group(1)
-            
-        # Извлекаем количество просмотров
-        views_match = re.search(r'Просмотров: ([\d\s]+)', content)
-        if views_match:
-            views_str = views_match.group(1).replace(' ', '')
-            metadata['views'] = int(views_str) if views_str.isdigit() else 0
-            
-        # Извлекаем основные разделы (заголовки уровня 5)
-        sections = re.findall(r'^##### (.+)$', content, re.MULTILINE)
+            for line in f:
+                if views_str is not None:
+                    continuation = _VIEWS_CONTINUATION_RE.match(line).group()
+                    views_str += continuation
+                    if len(continuation) < len(line):
+                        finish_views(views_str)
+                        views_str = None
+                
+                # Извлекаем URL из раздела Метаданные
+                if 'url' not in metadata and '**URL:**' in line:
+                    url_match = _URL_RE.search(line)
+                    if url_match:
+                        metadata['url'] = url_match.group(1)
+                
+                # Извлекаем дату последнего изменения
+                if 'last_modified' not in metadata and 'Дата последнего изменения' in line:
+                    date_match = _LAST_MODIFIED_RE.search(line)
+                    if date_match:
+                        metadata['last_modified'] = date_match.group(1)
+                
+                # Извлекаем количество просмотров
+                if 'views' not in metadata and views_str is None and 'Просмотров' in line:
+                    views_match = _VIEWS_RE.search(line)
+                    if views_match:
+                        if views_match.end() == len(line):
+                            # Число дошло до конца строки и может продолжаться на следующей
+                            views_str = views_match.group(1)
+                        else:
+                            finish_views(views_match.group(1))
+                
+                # Извлекаем основные разделы (заголовки уровня 5)
+                if len(sections) < MAX_SECTIONS and line.startswith('##### '):
+                    section = line[6:].rstrip('\n')
+                    if section:
+                        sections.append(section)
+                
+                if ('url' in metadata and 'last_modified' in metadata and 'views' in metadata
+                        and len(sections) >= MAX_SECTIONS):
+                    break
+        
+        if views_str is not None:
+            finish_views(views_str)
         if sections:
-            metadata['sections'] = sections[:8]  # Ограничиваем до 8 основных разделов
+            metadata['sections'] = sections  # Ограничиваем до 8 основных разделов
             
     except Exception as e:
         print(f"Ошибка при обработке MD файла {md_file_path}: {e}")
@@ -54,36 +230,82 @@ def extract_metadata_from_md(md_file_path):
     return metadata
 
 
+def read_title_from_md(md_file_path):
+    """
+    Построчный поиск заголовка урока в MD файле с остановкой на первом совпадении
+    
+    Ищет первый заголовок третьего уровня (###) в разделе "Содержимое"
+    (до следующего заголовка второго уровня), а если там его нет -
+    первый заголовок третьего уровня во всем файле.
+    
+    Args:
+        md_file_path: Путь к MD файлу
+        
+    Returns:
+        str: Заголовок урока или None если заголовок не найден
+    """
+    first_title = None  # Первый заголовок ### во всем файле (запасной вариант)
+    in_content = False  # Внутри раздела "Содержимое"
+    content_done = False  # Раздел "Содержимое" уже закончился
+    section_started = False  # Пропущены пустые строки после маркера раздела
+    
+    with open(md_file_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.rstrip('\n')
+            
+            if in_content:
+                if not section_started:
+                    # Пустые строки после маркера относятся к нему самому,
+                    # первая непустая строка всегда входит в раздел
+                    if not line.strip():
+                        continue
+                    section_started = True
+                elif line.startswith('## '):
+                    # Раздел закончился без заголовка ###: берем первый ### во всем файле
+                    in_content = False
+                    content_done = True
+                    if first_title is not None:
+                        return first_title
+                    continue
+            
+            if line.startswith('### ') and len(line) > 4:
+                title = line[4:].strip()
+                if in_content or content_done:
+                    return title
+                if first_title is None:
+                    first_title = title
+            
+            if not (in_content or content_done):
+                marker_pos = line.find(CONTENT_SECTION_MARKER)
+                if marker_pos != -1 and not line[marker_pos + len(CONTENT_SECTION_MARKER):].strip():
+                    in_content = True
+    
+    return first_title
+
+
 def extract_title_from_md(md_file_path):
     """
     Извлекает заголовок урока из MD файла
     Ищет первый заголовок третьего уровня (###) в разделе "Содержимое"
     
+    Результат кэшируется в директории курса (MAP_CACHE_FILENAME) с проверкой
+    времени изменения и размера файла.
+    
     Args:
         md_file_path: Путь к MD файлу
         
     Returns:
         str: Заголовок урока или имя файла если заголовок не найден
     """
+    def read_title_or_filename(md_file_path):
+        title = read_title_from_md(md_file_path)
+        if title is None:
+            # Возвращаем имя файла без расширения как fallback
+            title = os.path.basename(md_file_path).replace('.md', '')
+        return title
+    
     try:
-        with open(md_file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        # Ищем раздел "## Содержимое"
-        content_section_match = re.search(r'## Содержимое\s*\n(.*?)(?=\n## |$)', content, re.DOTALL)
-        if content_section_match:
-            content_section = content_section_match.group(1)
-            
-            # Ищем первый заголовок третьего уровня в разделе содержимое
-            title_match = re.search(r'^### (.+)$', content_section, re.MULTILINE)
-            if title_match:
-                return title_match.group(1).strip()
-        
-        # Если не найден заголовок в разделе содержимое, ищем любой заголовок третьего уровня
-        title_match = re.search(r'^### (.+)$', content, re.MULTILINE)
-        if title_match:
-            return title_match.group(1).strip()
-            
+        return get_cached_md_value(md_file_path, 'title', read_title_or_filename)
     except Exception as e:
         print(f"Ошибка при извлечении заголовка из {md_file_path}: {e}")
     
@@ -102,7 +324,7 @@ def extract_course_id_from_path(course_dir):
     Returns:
         str: ID курса или None если не удалось извлечь
     """
-    match = re.search(r'course_(\d+)', os.path.basename(course_dir))
+    match = _COURSE_ID_RE.search(os.path.basename(course_dir))
     return match.group(1) if match else None
 
 
@@ -122,14 +344,13 @@ def scan_courses_directory(data_dir):
         print(f"Директория {data_dir} не найдена")
         return courses
     
-    # Перебираем все поддиректории в data
-    for item in os.listdir(data_dir):
-        course_path = os.path.join(data_dir, item)
-        
-        if os.path.isdir(course_path) and item.startswith('course_'):
-            course_info = process_course_directory(course_path, item)
-            if course_info:
-                courses.append(course_info)
+    # Перебираем все поддиректории в data (scandir отдает тип записи без отдельного stat)
+    with os.scandir(data_dir) as entries:
+        for entry in entries:
+            if entry.name.startswith('course_') and entry.is_dir():
+                course_info = process_course_directory(entry.path, entry.name)
+                if course_info:
+                    courses.append(course_info)
     
     # Сортируем курсы по ID
     courses.sort(key=lambda x: int(x.get('course_id', '0')))
@@ -158,12 +379,11 @@ def process_course_directory(course_path, course_dirname):
     course_info_path = os.path.join(course_path, 'course_info.json')
     if os.path.exists(course_info_path):
         try:
-            with open(course_info_path, 'r', encoding='utf-8') as f:
-                json_data = json.load(f)
-                course_info['title'] = json_data.get('title', 'Без названия')
-                course_info['description'] = json_data.get('description', '')
-                course_info['lessons_count'] = len(json_data.get('lessons', []))
-                course_info['lessons'] = json_data.get('lessons', [])
+            json_data = load_json_file(course_info_path)
+            course_info['title'] = json_data.get('title', 'Без названия')
+            course_info['description'] = json_data.get('description', '')
+            course_info['lessons_count'] = len(json_data.get('lessons', []))
+            course_info['lessons'] = json_data.get('lessons', [])
         except Exception as e:
             print(f"Ошибка при чтении course_info.json в {course_path}: {e}")
             return None
@@ -171,19 +391,27 @@ def process_course_directory(course_path, course_dirname):
         print(f"Файл course_info.json не найден в {course_path}")
         return None
     
-    # Ищем главный MD файл курса
+    # Ищем главный MD файл курса и собираем список MD файлов за один проход по директории
     main_md_file = None
-    for file in os.listdir(course_path):
-        if file.endswith('.md') and not ('lesson' in file.lower() or 'урок' in file.lower() or 'глава' in file.lower()):
-            main_md_file = os.path.join(course_path, file)
-            break
+    md_files = []
+    with os.scandir(course_path) as entries:
+        for entry in entries:
+            file = entry.name
+            if not file.endswith('.md'):
+                continue
+            md_files.append(file)
+            if main_md_file is None:
+                file_lower = file.lower()
+                if not ('lesson' in file_lower or 'урок' in file_lower or 'глава' in file_lower):
+                    main_md_file = entry.path
     
     if main_md_file:
-        metadata = extract_metadata_from_md(main_md_file)
+        metadata = get_cached_md_value(main_md_file, 'metadata', extract_metadata_from_md)
         course_info.update(metadata)
+        save_course_cache(course_path)
     
-    # Подсчитываем количество MD файлов в директории
-    md_files = [f for f in os.listdir(course_path) if f.endswith('.md')]
+    md_files.sort()  # Сортируем файлы по алфавиту
+    course_info['md_files'] = md_files
     course_info['md_files_count'] = len(md_files)
     
     return course_info
@@ -213,7 +441,8 @@ def generate_course_map(courses, output_file):
     content.append("## 📂 Ссылки на файлы курсов")
     content.append("")
     
-    # Для каждого курса находим все MD файлы и создаем ссылки
+    # Для каждого курса находим все MD файлы
+    course_md_files = []
     for course in courses:
         course_directory = course.get('directory', '')
         course_path = course.get('path', '')
@@ -221,29 +450,45 @@ def generate_course_map(courses, output_file):
         if not course_path or not os.path.exists(course_path):
             continue
             
-        # Получаем все MD файлы в директории курса
-        try:
-            md_files = [f for f in os.listdir(course_path) if f.endswith('.md')]
-            md_files.sort()  # Сортируем файлы по алфавиту
-            
-            if md_files:
-                course_title = course.get('title', 'Без названия')
-                content.append(f"### {course_title}")
-                content.append("")
-                
-                for md_file in md_files:
-                    # Создаем относительную ссылку
-                    relative_path = f"data/{course_directory}/{md_file}"
-                    # Извлекаем заголовок из содержимого MD файла
-                    md_file_path = os.path.join(course_path, md_file)
-                    link_text = extract_title_from_md(md_file_path)
-                    content.append(f"- [{link_text}]({relative_path})")
-                
-                content.append("")
-                
-        except Exception as e:
-            print(f"Ошибка при обработке курса {course_directory}: {e}")
-            continue
+        # Берем список MD файлов, собранный process_course_directory,
+        # и читаем директорию курса только если его нет
+        md_files = course.get('md_files')
+        if md_files is None:
+            try:
+                with os.scandir(course_path) as entries:
+                    md_files = [entry.name for entry in entries if entry.name.endswith('.md')]
+                md_files.sort()  # Сортируем файлы по алфавиту
+            except Exception as e:
+                print(f"Ошибка при обработке курса {course_directory}: {e}")
+                continue
+        
+        if md_files:
+            course_md_files.append((course, md_files))
+    
+    # Извлекаем заголовки из содержимого MD файлов параллельно: чтение множества
+    # небольших файлов упирается в ожидание диска, а не в процессор
+    md_file_paths = [
+        os.path.join(course['path'], md_file)
+        for course, md_files in course_md_files
+        for md_file in md_files
+    ]
+    with ThreadPoolExecutor(max_workers=TITLE_READ_WORKERS) as executor:
+        link_texts = iter(list(executor.map(extract_title_from_md, md_file_paths)))
+    
+    # Создаем ссылки в исходном порядке курсов и файлов
+    for course, md_files in course_md_files:
+        course_directory = course.get('directory', '')
+        course_title = course.get('title', 'Без названия')
+        content.append(f"### {course_title}")
+        content.append("")
+        
+        for md_file in md_files:
+            # Создаем относительную ссылку
+            relative_path = f"data/{course_directory}/{md_file}"
+            content.append(f"- [{next(link_texts)}]({relative_path})")
+        
+        content.append("")
+        save_course_cache(course['path'], md_files)
     
     # Footer
     content.append("---")
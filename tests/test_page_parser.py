@@ -0,0 +1,108 @@
+"""
+Проверка разбора страницы по частям: результат CoursePageParser не должен
+зависеть от того, где заканчиваются блоки ответа
+
+Запуск: python -m unittest discover -s tests
+"""
+
+import email.message
+import gzip
+import io
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts'))
+
+from bitrix_course_parser_standalone import (  # noqa: E402
+    READ_CHUNK_SIZE,
+    CoursePageParser,
+    iter_response_text,
+    iter_tag_aligned_text,
+)
+
+
+class FakeResponse:
+    """Ответ HTTP с телом в памяти, отдающий данные блоками не больше max_read байт"""
+    def __init__(self, body, content_encoding=None, max_read=None):
+        self._body = io.BytesIO(body)
+        self._max_read = max_read
+        self.headers = email.message.Message()
+        self.headers['Content-Type'] = 'text/html; charset=utf-8'
+        if content_encoding:
+            self.headers['Content-Encoding'] = content_encoding
+
+    def read(self, size):
+        if self._max_read:
+            size = min(size, self._max_read)
+        return self._body.read(size)
+
+
+def build_lesson_page(paragraphs=1500):
+    """Страница урока больше READ_CHUNK_SIZE с заголовками, ссылками и сущностями"""
+    parts = [
+        '<html><head><title>Урок</title><script>if (a < b) { x = "<p>"; }</script></head>',
+        '<body><div class="courses-right-side"><h1>Заголовок урока</h1>',
+    ]
+    for n in range(paragraphs):
+        parts.append(f'<p>Абзац номер {n} с текстом урока про Bitrix Framework &amp; D7</p>')
+        if n % 50 == 0:
+            parts.append(f'<h2>Раздел {n} &laquo;длинное название раздела&raquo;</h2>')
+            parts.append(f'<p>Ссылка: <a href="https://example.com/{n}">текст внешней ссылки {n}</a></p>')
+            parts.append('<p>x</p>')
+    parts.append('</div></body></html>')
+    return ''.join(parts)
+
+
+def parse_whole(page):
+    parser = CoursePageParser()
+    parser.feed(page)
+    parser.close()
+    return parser
+
+
+def parse_chunks(chunks):
+    parser = CoursePageParser()
+    for text in iter_tag_aligned_text(chunks):
+        parser.feed(text)
+    parser.close()
+    return parser
+
+
+class StreamedParseTest(unittest.TestCase):
+    def assertSameContent(self, expected, actual):
+        self.assertEqual(expected.headers, actual.headers)
+        self.assertEqual(expected.text_content, actual.text_content)
+        self.assertEqual(expected.content_digest(), actual.content_digest())
+
+    def test_gzip_response_over_read_chunk_size(self):
+        page = build_lesson_page()
+        body = page.encode('utf-8')
+        self.assertGreater(len(body), 2 * READ_CHUNK_SIZE)
+
+        response = FakeResponse(gzip.compress(body), content_encoding='gzip')
+        self.assertSameContent(parse_whole(page), parse_chunks(iter_response_text(response)))
+
+    def test_random_chunk_boundaries(self):
+        page = build_lesson_page(paragraphs=300)
+        expected = parse_whole(page)
+        rng = random.Random(0)
+        for _ in range(20):
+            chunks = []
+            start = 0
+            while start < len(page):
+                end = start + rng.randint(1, 200)
+                chunks.append(page[start:end])
+                start = end
+            self.assertSameContent(expected, parse_chunks(chunks))
+
+    def test_text_node_split_inside_word(self):
+        page = ('<div class="courses-right-side"><h2>Заголовок раздела</h2>'
+                '<p>Hello world</p><p><a href="https://example.com">текст ссылки</a></p></div>')
+        for split in range(1, len(page)):
+            self.assertSameContent(parse_whole(page), parse_chunks([page[:split], page[split:]]))
+
+
+if __name__ == '__main__':
+    unittest.main()